@@ -7,18 +7,36 @@ Controls:
   SPACE: pause/unpause
   ENTER: restart after game over
   ESC: quit
-  S: save
-  L: load
+  S: save (to save_slot.pkl)
+  L: load (falls back to a legacy save_slot.json)
 
 This implementation uses a grid and tick-based movement so rendering stays smooth at 60 FPS
 while the game logic advances at `moves_per_second` set by the current level.
 """
 import arcade
 import arcade.draw
+import itertools
+import pyglet
 import random
 import json
 import os
-from typing import List, Tuple
+import pickle
+import threading
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from arcade.gl import geometry
+
+# orjson is optional; fall back to the standard library when it isn't installed
+try:
+    import orjson
+
+    _json_dumps = orjson.dumps
+    _json_loads = orjson.loads
+except ImportError:
+    def _json_dumps(data) -> bytes:
+        return json.dumps(data).encode()
+
+    _json_loads = json.loads
 
 # Configuration
 CELL_SIZE = 20
@@ -28,10 +46,55 @@ SCREEN_WIDTH = CELL_SIZE * GRID_WIDTH
 SCREEN_HEIGHT = CELL_SIZE * GRID_HEIGHT
 SCREEN_TITLE = "Snake Game with Levels"
 
-SAVE_FILE = "save_slot.json"
+# Reusable players per sound effect, so overlapping events can still play
+PLAYERS_PER_SOUND = 2
+
+# Checkerboard background, computed per fragment from the window pixel coordinates
+CHECKER_VERTEX_SHADER = """
+#version 330
+in vec2 in_vert;
+void main() {
+    gl_Position = vec4(in_vert, 0.0, 1.0);
+}
+"""
+CHECKER_FRAGMENT_SHADER = """
+#version 330
+uniform vec4 color_even;
+uniform vec4 color_odd;
+uniform float cell_size;
+uniform float gap;
+out vec4 out_color;
+void main() {
+    vec2 cell = floor(gl_FragCoord.xy / cell_size);
+    vec2 offset = gl_FragCoord.xy - cell * cell_size;
+    // Leave the grid line between cells showing the window background
+    if (offset.x >= cell_size - gap || offset.y >= cell_size - gap) {
+        discard;
+    }
+    out_color = mod(cell.x + cell.y, 2.0) < 0.5 ? color_even : color_odd;
+}
+"""
+
+# Upper bound on game ticks run in a single frame after a stall
+MAX_TICKS_PER_FRAME = 5
+
+SAVE_FILE = "save_slot.pkl"
+# Saves written before the switch to pickle; still readable by load_game
+LEGACY_SAVE_FILE = "save_slot.json"
 HIGHSCORE_FILE = "highscore.json"
 
 Pos = Tuple[int, int]
+# A grid cell packed into one int: y * GRID_WIDTH + x
+Cell = int
+
+
+def pack(x: int, y: int) -> Cell:
+    return y * GRID_WIDTH + x
+
+
+def unpack(cell: Cell) -> Pos:
+    return cell % GRID_WIDTH, cell // GRID_WIDTH
+
 
 LEVELS = [
     {"score": 0,   "speed": 5},   # Level 1
@@ -40,17 +103,95 @@ LEVELS = [
     {"score": 150, "speed": 15},  # Level 4
 ]
 
+# Flattened views of LEVELS (sorted by ascending score) for the level-up check
+_LEVEL_SCORES = tuple(level["score"] for level in LEVELS)
+_LEVEL_SPEEDS = tuple(level["speed"] for level in LEVELS)
+
 
 class SnakeGame(arcade.Window):
+    # Slots give the per-tick game state fixed offsets instead of __dict__ lookups.
+    # arcade.Window already provides a __dict__, so its own attributes are unaffected.
+    __slots__ = (
+        "asset_path",
+        "_ring",
+        "_head",
+        "_length",
+        "_sprite_ring",
+        "_occupied",
+        "direction",
+        "_pending_dir",
+        "food",
+        "score",
+        "level_index",
+        "moves_per_second",
+        "_tick_interval",
+        "tick_accumulator",
+        "game_over",
+        "paused",
+        "highscore",
+        "sound_eat",
+        "sound_level",
+        "sound_gameover",
+        "sound_bgm",
+        "_players",
+        "_bg_program",
+        "_bg_quad",
+        "_snake_sprites",
+        "_score_text",
+        "_level_text",
+        "_high_text",
+        "_paused_text",
+        "_gameover_text",
+    )
+
     def __init__(self):
         super().__init__(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_TITLE)
         arcade.set_background_color(arcade.color.AMAZON)
         self.asset_path = os.path.join(os.path.dirname(__file__), "assets")
-        self._load_sounds()
+        self._build_background()
+        self._snake_sprites = arcade.SpriteList(use_spatial_hash=False)
+        self._build_hud()
+        # Sounds load in the background; _maybe_play skips any that aren't ready yet
+        self.sound_eat = self.sound_level = self.sound_gameover = self.sound_bgm = None
+        self._players = {}
+        threading.Thread(target=self._load_sounds_bg, daemon=True).start()
+        # Read once; afterwards the in-memory value is authoritative, since a new
+        # record may still be on its way to disk when the next game starts
+        self.load_highscore()
         self.reset_game()
 
-    def _load_sounds(self):
-        # Attempt to load sounds; missing files are allowed
+    def _build_background(self):
+        # The checkerboard is drawn by a fragment shader over one fullscreen quad
+        self._bg_program = self.ctx.program(
+            vertex_shader=CHECKER_VERTEX_SHADER,
+            fragment_shader=CHECKER_FRAGMENT_SHADER,
+        )
+        # gl_FragCoord is in framebuffer pixels, which differ from window units on HiDPI
+        ratio = self.get_pixel_ratio()
+        self._bg_program["color_even"] = arcade.color.DARK_SLATE_GRAY.normalized
+        self._bg_program["color_odd"] = arcade.color.DIM_GRAY.normalized
+        self._bg_program["cell_size"] = CELL_SIZE * ratio
+        self._bg_program["gap"] = ratio
+        self._bg_quad = geometry.quad_2d_fs()
+
+    def _build_hud(self):
+        # Text objects keep their layout between frames; only .text changes when values do
+        self._score_text = arcade.Text("Score: 0", 10, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
+        self._level_text = arcade.Text("Level: 1", 150, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
+        self._high_text = arcade.Text("High: 0", 280, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
+        self._paused_text = arcade.Text("Paused", SCREEN_WIDTH / 2 - 40, SCREEN_HEIGHT / 2, arcade.color.YELLOW, 24)
+        self._gameover_text = arcade.Text(
+            "GAME OVER - Press ENTER to restart", SCREEN_WIDTH / 2 - 180, SCREEN_HEIGHT / 2, arcade.color.RED, 18
+        )
+
+    def _refresh_hud(self):
+        self._score_text.text = f"Score: {self.score}"
+        self._level_text.text = f"Level: {self.level_index + 1}"
+        self._high_text.text = f"High: {self.highscore}"
+
+    def _load_sounds_bg(self):
+        # Attempt to load sounds; missing files are allowed.
+        # Each attribute is set as soon as its sound has finished loading.
         def load(name):
             path = os.path.join(self.asset_path, name)
             try:
@@ -64,70 +205,125 @@ class SnakeGame(arcade.Window):
         self.sound_bgm = load("bgm.ogg") or load("bgm.mp3")
 
     def reset_game(self):
+        # The snake body lives in a ring buffer sized for the whole grid, so moving
+        # only shifts the head index and never allocates
+        self._ring: List[Optional[Cell]] = [None] * (GRID_WIDTH * GRID_HEIGHT)
+        # Segment sprites, stored at the same ring index as the cell they draw
+        self._sprite_ring: List[Optional[arcade.SpriteSolidColor]] = [None] * len(self._ring)
         # Start with a single-segment snake in the center
-        self.snake: List[Pos] = [(GRID_WIDTH // 2, GRID_HEIGHT // 2)]
+        self._set_snake([pack(GRID_WIDTH // 2, GRID_HEIGHT // 2)])
         self.direction: Pos = (1, 0)
+        # Direction requested by input, applied at the start of the next tick
+        self._pending_dir: Pos = self.direction
+        self._rebuild_snake_sprites()
         self.spawn_food()
         self.score = 0
         self.level_index = 0
         self.moves_per_second = LEVELS[self.level_index]["speed"]
+        # Seconds per game tick; refreshed wherever moves_per_second changes
+        self._tick_interval = 1.0 / self.moves_per_second
         self.tick_accumulator = 0.0
         self.game_over = False
         self.paused = False
-        self.load_highscore()
+        self._refresh_hud()
+
+    def _set_snake(self, cells: Iterable[Cell]):
+        # Lay the body out head-first from slot 0 and rebuild the occupied set
+        cells = list(cells)
+        self._ring[:len(cells)] = cells
+        self._head = 0
+        self._length = len(cells)
+        # Occupied cells, kept in sync with the ring for O(1) membership tests
+        self._occupied: Set[Cell] = set(cells)
+
+    def _iter_snake(self) -> Iterator[Cell]:
+        # Segments from head to tail
+        ring = self._ring
+        cap = len(ring)
+        for i in range(self._length):
+            yield ring[(self._head + i) % cap]
+
+    def _make_segment(self, cell: Cell, color) -> arcade.SpriteSolidColor:
+        # Segment sprites cover the same CELL_SIZE - 2 square the old rectangles did
+        sprite = arcade.SpriteSolidColor(CELL_SIZE - 2, CELL_SIZE - 2, color=color)
+        self._place_segment(sprite, cell)
+        return sprite
+
+    @staticmethod
+    def _place_segment(sprite: arcade.SpriteSolidColor, cell: Cell):
+        x, y = unpack(cell)
+        half = (CELL_SIZE - 2) / 2
+        sprite.center_x = x * CELL_SIZE + half
+        sprite.center_y = y * CELL_SIZE + half
+
+    def _rebuild_snake_sprites(self):
+        # One sprite per segment, kept at the segment's ring index. Cells never
+        # overlap, so the order inside the SpriteList doesn't matter.
+        self._snake_sprites.clear()
+        self._sprite_ring[:] = [None] * len(self._sprite_ring)
+        cap = len(self._ring)
+        for i, cell in enumerate(self._iter_snake()):
+            color = arcade.color.GREEN if i == 0 else arcade.color.DARK_GREEN
+            sprite = self._make_segment(cell, color)
+            self._sprite_ring[(self._head + i) % cap] = sprite
+            self._snake_sprites.append(sprite)
 
     def spawn_food(self):
         # Place food on a random free grid cell
-        while True:
-            p = (random.randint(0, GRID_WIDTH - 1), random.randint(0, GRID_HEIGHT - 1))
-            if p not in self.snake:
-                self.food = p
-                return
+        total = GRID_WIDTH * GRID_HEIGHT
+        if len(self._occupied) < total * 0.5:
+            # Sparse board: rejection sampling hits a free cell within a couple of tries
+            while True:
+                p = random.randrange(total)
+                if p not in self._occupied:
+                    self.food = p
+                    return
+
+        # Dense board: sample uniformly from the free cells instead of retrying
+        occupied = self._occupied
+        free = [c for c in range(total) if c not in occupied]
+        if not free:
+            # The snake fills the whole board; nothing left to eat
+            self.food = None
+            self._end_game()
+            return
+        self.food = random.choice(free)
 
     def on_draw(self):
         self.clear()
-        # Draw checkerboard grid
-        for x in range(GRID_WIDTH):
-            for y in range(GRID_HEIGHT):
-                color = arcade.color.DARK_SLATE_GRAY if (x + y) % 2 == 0 else arcade.color.DIM_GRAY
-                arcade.draw.draw_lrbt_rectangle_filled(
-                    x * CELL_SIZE,
-                    (x + 1) * CELL_SIZE - 1,
-                    y * CELL_SIZE,
-                    (y + 1) * CELL_SIZE - 1,
-                    color,
-                )
-
-        # Draw food
-        fx, fy = self.food
-        arcade.draw.draw_circle_filled(fx * CELL_SIZE + CELL_SIZE / 2, fy * CELL_SIZE + CELL_SIZE / 2, CELL_SIZE // 2 - 2, arcade.color.RED)
-
-        # Draw snake segments
-        for i, (sx, sy) in enumerate(self.snake):
-            color = arcade.color.GREEN if i == 0 else arcade.color.DARK_GREEN
-            arcade.draw.draw_lrbt_rectangle_filled(sx * CELL_SIZE, (sx + 1) * CELL_SIZE - 2, sy * CELL_SIZE, (sy + 1) * CELL_SIZE - 2, color)
+        # Draw checkerboard grid (shader set up in _build_background)
+        self._bg_quad.render(self._bg_program)
+
+        # Draw food (None once the snake fills the board)
+        if self.food is not None:
+            cs = CELL_SIZE
+            fx, fy = unpack(self.food)
+            arcade.draw.draw_circle_filled(fx * cs + cs / 2, fy * cs + cs / 2, cs // 2 - 2, arcade.color.RED)
+
+        # Draw snake segments (positions are only touched in game_tick)
+        self._snake_sprites.draw()
 
         # HUD
-        arcade.draw_text(f"Score: {self.score}", 10, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
-        arcade.draw_text(f"Level: {self.level_index + 1}", 150, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
-        arcade.draw_text(f"High: {self.highscore}", 280, SCREEN_HEIGHT - 22, arcade.color.WHITE, 14)
+        self._score_text.draw()
+        self._level_text.draw()
+        self._high_text.draw()
 
         if self.paused:
-            arcade.draw_text("Paused", SCREEN_WIDTH / 2 - 40, SCREEN_HEIGHT / 2, arcade.color.YELLOW, 24)
+            self._paused_text.draw()
 
         if self.game_over:
-            arcade.draw_text("GAME OVER - Press ENTER to restart", SCREEN_WIDTH / 2 - 180, SCREEN_HEIGHT / 2, arcade.color.RED, 18)
+            self._gameover_text.draw()
 
     def on_key_press(self, key, modifiers):
-        # Change direction (prevent immediate 180-degree turn)
+        # Latch the next direction (prevent a 180-degree turn from the one actually moving)
         if key == arcade.key.UP and self.direction != (0, -1):
-            self.direction = (0, 1)
+            self._pending_dir = (0, 1)
         elif key == arcade.key.DOWN and self.direction != (0, 1):
-            self.direction = (0, -1)
+            self._pending_dir = (0, -1)
         elif key == arcade.key.LEFT and self.direction != (1, 0):
-            self.direction = (-1, 0)
+            self._pending_dir = (-1, 0)
         elif key == arcade.key.RIGHT and self.direction != (-1, 0):
-            self.direction = (1, 0)
+            self._pending_dir = (1, 0)
         elif key == arcade.key.SPACE:
             self.paused = not self.paused
         elif key == arcade.key.ENTER and self.game_over:
@@ -140,100 +336,199 @@ class SnakeGame(arcade.Window):
             self.load_game()
 
     def on_update(self, delta_time: float):
+        # Idle states return early rather than lowering the update rate: arcade runs
+        # on_update and drawing from the same scheduled frame, so throttling one
+        # would also throttle rendering of the pause and game-over screens
         if self.paused or self.game_over:
             return
         self.tick_accumulator += delta_time
-        tick_interval = 1.0 / self.moves_per_second
-        while self.tick_accumulator >= tick_interval:
+        tick_interval = self._tick_interval
+        steps = 0
+        while self.tick_accumulator >= tick_interval and steps < MAX_TICKS_PER_FRAME:
             self.tick_accumulator -= tick_interval
             self.game_tick()
+            steps += 1
+        if steps == MAX_TICKS_PER_FRAME:
+            # Drop the remaining backlog rather than spiral trying to catch up
+            self.tick_accumulator = min(self.tick_accumulator, tick_interval)
 
     def game_tick(self):
-        head_x, head_y = self.snake[0]
+        # Local bindings for the attributes touched on every tick
+        ring = self._ring
+        sprite_ring = self._sprite_ring
+        occupied = self._occupied
+        head_x, head_y = unpack(ring[self._head])
+        self.direction = self._pending_dir
         dx, dy = self.direction
-        new_head = (head_x + dx, head_y + dy)
-
-        # Check collisions
-        hx, hy = new_head
-        if hx < 0 or hx >= GRID_WIDTH or hy < 0 or hy >= GRID_HEIGHT or new_head in self.snake:
-            self.game_over = True
-            self._maybe_play(self.sound_gameover)
-            self.save_highscore()
+        hx = head_x + dx
+        hy = head_y + dy
+
+        # Check collisions: walls first, since off-grid coordinates would pack into a real cell
+        if not (0 <= hx < GRID_WIDTH and 0 <= hy < GRID_HEIGHT):
+            self._end_game()
+            return
+        new_head = pack(hx, hy)
+        if new_head in occupied:
+            self._end_game()
             return
 
-        # Move snake: insert new head
-        self.snake.insert(0, new_head)
+        # Move snake: the new head goes into the ring slot before the current one.
+        # The head cell was free, so the ring (one slot per grid cell) can't overflow.
+        old_head = self._head
+        head = (old_head - 1) % len(ring)
+        sprite_ring[old_head].color = arcade.color.DARK_GREEN
+        ate = new_head == self.food
+        if ate:
+            # Grow: the tail stays put and the head gets a new sprite
+            sprite = self._make_segment(new_head, arcade.color.GREEN)
+            self._snake_sprites.append(sprite)
+            self._length += 1
+        else:
+            # Move the tail segment, sprite included, to the new head
+            tail = (old_head + self._length - 1) % len(ring)
+            occupied.discard(ring[tail])
+            sprite = sprite_ring[tail]
+            self._place_segment(sprite, new_head)
+            sprite.color = arcade.color.GREEN
+        ring[head] = new_head
+        sprite_ring[head] = sprite
+        self._head = head
+        occupied.add(new_head)
 
         # Check for food
-        if new_head == self.food:
+        if ate:
             self.score += 10
+            self._score_text.text = f"Score: {self.score}"
             self._maybe_play(self.sound_eat)
             self.spawn_food()
             self.check_level_up()
-        else:
-            self.snake.pop()
+
+    def _end_game(self):
+        self.game_over = True
+        self._maybe_play(self.sound_gameover)
+        self.save_highscore()
 
     def check_level_up(self):
-        # Find highest level matching the current score
-        for idx in reversed(range(len(LEVELS))):
-            if self.score >= LEVELS[idx]["score"]:
-                if idx != self.level_index:
-                    self.level_index = idx
-                    self.moves_per_second = LEVELS[idx]["speed"]
-                    self._maybe_play(self.sound_level)
-                break
+        # Levels only go up, so advance from the current one while the score allows
+        idx = self.level_index
+        while idx + 1 < len(_LEVEL_SCORES) and self.score >= _LEVEL_SCORES[idx + 1]:
+            idx += 1
+        if idx != self.level_index:
+            self.level_index = idx
+            self.moves_per_second = _LEVEL_SPEEDS[idx]
+            self._tick_interval = 1.0 / self.moves_per_second
+            self._level_text.text = f"Level: {idx + 1}"
+            self._maybe_play(self.sound_level)
 
     def _maybe_play(self, sound):
         try:
             if sound:
-                arcade.play_sound(sound)
+                # Round-robin pool of players per sound instead of a new Player on every play.
+                # Pools are created here, on the main thread, the first time a sound plays.
+                players = self._players.get(sound)
+                if players is None:
+                    players = itertools.cycle([pyglet.media.Player() for _ in range(PLAYERS_PER_SOUND)])
+                    self._players[sound] = players
+                player = next(players)
+                player.pause()
+                if player.source is not None:
+                    # Drop whatever this player was still playing
+                    player.next_source()
+                player.queue(sound.source)
+                player.play()
         except Exception:
             pass
 
     def save_game(self):
         data = {
-            "snake": self.snake,
+            # Saves keep (x, y) pairs so they don't depend on GRID_WIDTH
+            "snake": [unpack(c) for c in self._iter_snake()],
             "direction": self.direction,
-            "food": self.food,
+            "food": unpack(self.food) if self.food is not None else None,
             "score": self.score,
             "level_index": self.level_index,
         }
         try:
-            with open(SAVE_FILE, "w") as f:
-                json.dump(data, f)
+            with open(SAVE_FILE, "wb") as f:
+                pickle.dump(data, f, protocol=pickle.HIGHEST_PROTOCOL)
             print("Game saved.")
         except Exception as e:
             print("Failed to save:", e)
 
+    def _read_save(self) -> dict:
+        if os.path.exists(SAVE_FILE):
+            with open(SAVE_FILE, "rb") as f:
+                return pickle.load(f)
+        # Fall back to the old JSON save, which stores coordinates as lists
+        with open(LEGACY_SAVE_FILE, "rb") as f:
+            data = _json_loads(f.read())
+        data["snake"] = [tuple(p) for p in data["snake"]]
+        data["direction"] = tuple(data["direction"])
+        data["food"] = tuple(data["food"]) if data["food"] is not None else None
+        return data
+
     def load_game(self):
         try:
-            with open(SAVE_FILE, "r") as f:
-                data = json.load(f)
-            self.snake = [tuple(p) for p in data["snake"]]
-            self.direction = tuple(data["direction"])
-            self.food = tuple(data["food"])
-            self.score = data["score"]
-            self.level_index = data["level_index"]
+            data = self._read_save()
+
+            # Validate everything into locals first so a bad save leaves the running game untouched
+            def to_cell(p) -> Cell:
+                x, y = p
+                if not (0 <= x < GRID_WIDTH and 0 <= y < GRID_HEIGHT):
+                    raise ValueError(f"cell {p!r} is off the grid")
+                return pack(x, y)
+
+            cells = [to_cell(p) for p in data["snake"]]
+            if not cells or len(set(cells)) != len(cells):
+                raise ValueError("snake must be non-empty with no repeated cells")
+            direction = tuple(data["direction"])
+            if direction not in ((1, 0), (-1, 0), (0, 1), (0, -1)):
+                raise ValueError(f"invalid direction {direction!r}")
+            food = to_cell(data["food"]) if data["food"] is not None else None
+            score = int(data["score"])
+            level_index = data["level_index"]
+            if not (isinstance(level_index, int) and 0 <= level_index < len(LEVELS)):
+                raise ValueError(f"invalid level_index {level_index!r}")
+
+            self._set_snake(cells)
+            self.direction = direction
+            self._pending_dir = self.direction
+            self.food = food
+            self.score = score
+            self.level_index = level_index
+            self._rebuild_snake_sprites()
             self.moves_per_second = LEVELS[self.level_index]["speed"]
+            self._tick_interval = 1.0 / self.moves_per_second
             self.game_over = False
             self.paused = False
+            self._refresh_hud()
             print("Game loaded.")
         except Exception as e:
             print("Failed to load:", e)
 
     def save_highscore(self):
+        if self.score <= self.highscore:
+            return
+        # Update in memory right away; the disk write happens off the main thread
+        self.highscore = self.score
+        self._high_text.text = f"High: {self.highscore}"
+        threading.Thread(target=self._write_highscore, args=(self.score,), daemon=True).start()
+
+    @staticmethod
+    def _write_highscore(score: int):
+        # Write to a temp file and swap it in so a partial write never clobbers the old score
+        tmp = HIGHSCORE_FILE + ".tmp"
         try:
-            data = {"highscore": max(self.highscore, self.score)}
-            with open(HIGHSCORE_FILE, "w") as f:
-                json.dump(data, f)
-            self.highscore = data["highscore"]
+            with open(tmp, "wb") as f:
+                f.write(_json_dumps({"highscore": score}))
+            os.replace(tmp, HIGHSCORE_FILE)
         except Exception:
             pass
 
     def load_highscore(self):
         try:
-            with open(HIGHSCORE_FILE, "r") as f:
-                data = json.load(f)
+            with open(HIGHSCORE_FILE, "rb") as f:
+                data = _json_loads(f.read())
             self.highscore = data.get("highscore", 0)
         except Exception:
             self.highscore = 0